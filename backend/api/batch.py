@@ -0,0 +1,131 @@
+from django.db import connection, transaction
+from django.db.models import F
+
+from .cache import reset_user_flags
+from recipes.models import Recipe, ShoppingCart
+from recipes.shopping_list import add_recipe
+from users.models import Subscribe, User
+
+ADDED = 'added'
+EXISTS = 'exists'
+REMOVED = 'removed'
+NOT_FOUND = 'not_found'
+FORBIDDEN = 'forbidden'
+
+COUNTER_FIELDS = {
+    'favorite': 'favorites_count',
+    'shoppingcart': 'shopping_cart_count',
+}
+
+
+def make_results(ids, statuses):
+    """Собирает ответ пакетной операции в порядке переданных id."""
+    return [{'id': pk, 'status': statuses[pk]} for pk in dict.fromkeys(ids)]
+
+
+def insert_ignore_existing(model, user, field_name, ids):
+    """Вставляет связи пользователя с объектами ids, пропуская дубли.
+
+    Возвращает id объектов, строки для которых вставил именно этот
+    запрос: INSERT ... ON CONFLICT DO NOTHING RETURNING. Строки,
+    вставленные параллельными запросами, в результат не попадают.
+    """
+    if not ids:
+        return set()
+    opts = model._meta
+    quote_name = connection.ops.quote_name
+    user_column = quote_name(opts.get_field('user').column)
+    target_column = quote_name(opts.get_field(field_name).column)
+    ids = sorted(ids)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {quote_name(opts.db_table)} '
+            f'({user_column}, {target_column}) '
+            f'VALUES {", ".join(["(%s, %s)"] * len(ids))} '
+            f'ON CONFLICT DO NOTHING RETURNING {target_column}',
+            [value for pk in ids for value in (user.pk, pk)],
+        )
+        return {row[0] for row in cursor.fetchall()}
+
+
+def add_recipes(model, user, recipe_ids):
+    """Добавляет рецепты в избранное или корзину пользователя.
+
+    Вставка в обход ORM не отправляет сигналы, поэтому счетчики
+    рецептов, список покупок и кэш признаков пользователя обновляются
+    здесь же, ровно для вставленных этим запросом строк.
+    """
+    found = set(
+        Recipe.objects.filter(pk__in=recipe_ids).values_list('pk', flat=True)
+    )
+    with transaction.atomic():
+        added = insert_ignore_existing(model, user, 'recipe', found)
+        if added:
+            field = COUNTER_FIELDS[model._meta.model_name]
+            Recipe.objects.filter(pk__in=added).update(
+                **{field: F(field) + 1}
+            )
+            if model is ShoppingCart:
+                add_recipe(user.id, *added)
+            transaction.on_commit(lambda: reset_user_flags(user.id))
+    return make_results(
+        recipe_ids,
+        {
+            pk: ADDED if pk in added else EXISTS if pk in found else NOT_FOUND
+            for pk in recipe_ids
+        },
+    )
+
+
+def remove_recipes(model, user, recipe_ids):
+    """Убирает рецепты из избранного или корзины пользователя.
+
+    Удаление выполняется одним запросом через ORM, поэтому счетчики
+    и список покупок обновляют обычные сигналы.
+    """
+    queryset = model.objects.filter(user=user, recipe_id__in=recipe_ids)
+    with transaction.atomic():
+        removed = set(queryset.values_list('recipe_id', flat=True))
+        queryset.delete()
+    return make_results(
+        recipe_ids,
+        {pk: REMOVED if pk in removed else NOT_FOUND for pk in recipe_ids},
+    )
+
+
+def subscribe_authors(user, author_ids):
+    """Подписывает пользователя на авторов.
+
+    Как и в add_recipes, счетчики меняются только для вставленных этим
+    запросом подписок.
+    """
+    found = set(
+        User.objects.filter(pk__in=author_ids)
+        .exclude(pk=user.pk)
+        .values_list('pk', flat=True)
+    )
+    with transaction.atomic():
+        added = insert_ignore_existing(Subscribe, user, 'author', found)
+        if added:
+            User.objects.filter(pk__in=added).update(
+                subscribers_count=F('subscribers_count') + 1
+            )
+            transaction.on_commit(lambda: reset_user_flags(user.id))
+    statuses = {
+        pk: ADDED if pk in added else EXISTS if pk in found else NOT_FOUND
+        for pk in author_ids
+    }
+    statuses[user.pk] = FORBIDDEN
+    return make_results(author_ids, statuses)
+
+
+def unsubscribe_authors(user, author_ids):
+    """Отписывает пользователя от авторов."""
+    queryset = Subscribe.objects.filter(user=user, author_id__in=author_ids)
+    with transaction.atomic():
+        removed = set(queryset.values_list('author_id', flat=True))
+        queryset.delete()
+    return make_results(
+        author_ids,
+        {pk: REMOVED if pk in removed else NOT_FOUND for pk in author_ids},
+    )
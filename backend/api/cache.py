@@ -0,0 +1,179 @@
+import json
+from hashlib import md5, sha256
+from time import time
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.utils.encoding import iri_to_uri
+
+from recipes.models import Favorite, ShoppingCart
+from users.models import Subscribe
+
+RECIPES = 'recipes'
+TAGS = 'tags'
+INGREDIENTS = 'ingredients'
+USER_FLAGS_KEY = 'recipes:user-flags:{user_id}'
+SHOPPING_LIST_PDF_KEY = 'shopping-list:pdf:{digest}'
+
+
+def get_version(name):
+    """Возвращает текущую версию кэша для набора данных."""
+    key = f'{name}:version'
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, int(time() * 1000), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def get_last_modified(name):
+    """Возвращает время последнего изменения набора данных."""
+    key = f'{name}:modified'
+    modified = cache.get(key)
+    if modified is None:
+        modified = int(time())
+        cache.add(key, modified, timeout=None)
+    return modified
+
+
+def bump_version(name):
+    """Сдвигает версию кэша, делая устаревшими все связанные ключи."""
+    key = f'{name}:version'
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, int(time() * 1000), timeout=None)
+    cache.set(f'{name}:modified', int(time()), timeout=None)
+
+
+def user_flags_version_name(user_id):
+    """Имя версии избранного, корзины и подписок пользователя."""
+    return f'user-flags:{user_id}'
+
+
+def get_recipes_page(key, version):
+    """Возвращает закэшированную страницу рецептов версии version."""
+    return cache.get(key, version=version)
+
+
+def set_recipes_page(key, data, version):
+    """Сохраняет страницу рецептов в кэш версии version.
+
+    Версию нужно прочитать до запроса к базе данных: тогда изменение,
+    зафиксированное во время сборки страницы, сдвинет версию, и
+    устаревшая страница останется под старым ключом.
+    """
+    cache.set(
+        key,
+        data,
+        timeout=settings.RECIPES_CACHE_TIMEOUT,
+        version=version,
+    )
+
+
+def make_page_key(request):
+    """Строит ключ кэша по полному адресу запроса."""
+    uri = iri_to_uri(request.build_absolute_uri())
+    return f'recipes:page:{md5(uri.encode()).hexdigest()}'
+
+
+def get_user_flags(user):
+    """Возвращает множества id избранного, корзины и подписок.
+
+    Множества хранятся под версией user_flags_version_name, прочитанной
+    до запроса к базе данных, как и страницы рецептов.
+    """
+    key = USER_FLAGS_KEY.format(user_id=user.id)
+    version = get_version(user_flags_version_name(user.id))
+    flags = cache.get(key, version=version)
+    if flags is None:
+        flags = {
+            'favorites': set(
+                Favorite.objects.filter(user=user).values_list(
+                    'recipe_id', flat=True
+                )
+            ),
+            'shopping_cart': set(
+                ShoppingCart.objects.filter(user=user).values_list(
+                    'recipe_id', flat=True
+                )
+            ),
+            'subscriptions': set(
+                Subscribe.objects.filter(user=user).values_list(
+                    'author_id', flat=True
+                )
+            ),
+        }
+        cache.set(
+            key,
+            flags,
+            timeout=settings.RECIPES_CACHE_TIMEOUT,
+            version=version,
+        )
+    return flags
+
+
+def reset_user_flags(user_id):
+    """Делает устаревшими множества id пользователя в кэше."""
+    bump_version(user_flags_version_name(user_id))
+
+
+def apply_user_flags(recipes, user, fields=None):
+    """Дополняет общие данные рецептов признаками текущего пользователя.
+
+    Признаки ищутся по id рецепта, поэтому id должен быть в данных. Если
+    клиент выбрал поля без id, он убирается после проставления признаков.
+    """
+    flags = None
+    for recipe in recipes:
+        author = recipe.get('author')
+        if flags is None and user.is_authenticated and (
+            'is_favorited' in recipe
+            or 'is_in_shopping_cart' in recipe
+            or author is not None
+        ):
+            flags = get_user_flags(user)
+        if 'is_favorited' in recipe:
+            recipe['is_favorited'] = bool(
+                flags and recipe['id'] in flags['favorites']
+            )
+        if 'is_in_shopping_cart' in recipe:
+            recipe['is_in_shopping_cart'] = bool(
+                flags and recipe['id'] in flags['shopping_cart']
+            )
+        if author is None:
+            continue
+        if user.is_anonymous:
+            author['email'], author['username'] = None, None
+        if 'is_subscribed' in author:
+            author['is_subscribed'] = bool(
+                flags and author['id'] in flags['subscriptions']
+            )
+    if fields is not None and 'id' not in fields:
+        for recipe in recipes:
+            recipe.pop('id', None)
+    return recipes
+
+
+def make_shopping_list_digest(items, created):
+    """Хэш содержимого списка покупок на дату created."""
+    rows = [
+        (item['name'], item['measurement_unit'], item['amount'])
+        for item in items
+    ]
+    payload = json.dumps((created.isoformat(), rows), ensure_ascii=False)
+    return sha256(payload.encode()).hexdigest()
+
+
+def get_shopping_list_pdf(digest):
+    """Возвращает ранее сформированный PDF списка покупок."""
+    return caches['shopping_lists'].get(
+        SHOPPING_LIST_PDF_KEY.format(digest=digest)
+    )
+
+
+def set_shopping_list_pdf(digest, pdf):
+    """Сохраняет PDF списка покупок по хэшу его содержимого."""
+    caches['shopping_lists'].set(
+        SHOPPING_LIST_PDF_KEY.format(digest=digest), pdf
+    )
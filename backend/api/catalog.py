@@ -0,0 +1,60 @@
+import gzip
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.renderers import JSONRenderer
+
+from .cache import INGREDIENTS, get_version
+from .serializers import IngredientSerializer
+from recipes.models import Ingredient
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+CATALOG_KEY = 'ingredients:catalog'
+CATALOG_ENCODINGS = ('identity', 'gzip') + (('br',) if brotli else ())
+
+
+def build_catalog():
+    """Сериализует весь каталог ингредиентов и сжимает его."""
+    content = JSONRenderer().render(
+        IngredientSerializer(Ingredient.objects.all(), many=True).data
+    )
+    catalog = {
+        'identity': content,
+        'gzip': gzip.compress(content, compresslevel=9, mtime=0),
+    }
+    if brotli is not None:
+        catalog['br'] = brotli.compress(content)
+    return catalog
+
+
+def get_catalog():
+    """Возвращает сжатые копии каталога текущей версии."""
+    version = get_version(INGREDIENTS)
+    catalog = cache.get(CATALOG_KEY, version=version)
+    if catalog is None:
+        catalog = build_catalog()
+        cache.set(
+            CATALOG_KEY,
+            catalog,
+            timeout=settings.INGREDIENTS_CATALOG_TIMEOUT,
+            version=version,
+        )
+    return catalog
+
+
+def choose_encoding(accept_encoding, available):
+    """Выбирает лучшее сжатие из принимаемых клиентом."""
+    accepted = set()
+    for coding in accept_encoding.split(','):
+        name, _, params = coding.strip().partition(';')
+        if params.replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00'):
+            continue
+        accepted.add(name.strip().lower())
+    for encoding in ('br', 'gzip'):
+        if encoding in available and encoding in accepted:
+            return encoding
+    return 'identity'
@@ -0,0 +1,111 @@
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from threading import Lock
+from time import time
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .cache import (
+    get_shopping_list_pdf,
+    make_shopping_list_digest,
+    set_shopping_list_pdf,
+)
+from .utils import create_shopping_list_pdf
+
+logger = logging.getLogger(__name__)
+
+JOB_KEY = 'shopping-list:job:{job_id}'
+PENDING = 'pending'
+DONE = 'done'
+FAILED = 'failed'
+
+_executor = None
+_executor_lock = Lock()
+
+
+def get_executor():
+    """Пул процессов для формирования PDF, создаваемый при первом вызове.
+
+    Пул создается лениво, уже в процессе воркера, а не при импорте.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.SHOPPING_LIST_EXPORT_WORKERS
+            )
+        return _executor
+
+
+def render_pdf(items, created):
+    """Формирует PDF в процессе пула и возвращает его содержимое."""
+    return create_shopping_list_pdf(items, created).getvalue()
+
+
+def get_job(job_id):
+    """Возвращает состояние задачи выгрузки.
+
+    Задача, не завершившаяся за SHOPPING_LIST_JOB_DEADLINE секунд,
+    считается неудавшейся: воркер, в котором она выполнялась, мог быть
+    перезапущен, и тогда finish_job уже не вызовется.
+    """
+    job = cache.get(JOB_KEY.format(job_id=job_id))
+    if (
+        job is not None
+        and job['status'] == PENDING
+        and time() - job['started'] > settings.SHOPPING_LIST_JOB_DEADLINE
+    ):
+        job['status'] = FAILED
+    return job
+
+
+def set_job(job_id, user_id, digest, status, started):
+    """Сохраняет состояние задачи выгрузки в общий кэш."""
+    cache.set(
+        JOB_KEY.format(job_id=job_id),
+        {
+            'user_id': user_id,
+            'digest': digest,
+            'status': status,
+            'started': started,
+        },
+        timeout=settings.SHOPPING_LIST_JOB_TIMEOUT,
+    )
+
+
+def finish_job(job_id, user_id, digest, started, future):
+    """Сохраняет готовый PDF и отмечает задачу завершенной."""
+    try:
+        pdf = future.result()
+    except Exception:
+        logger.exception('Не удалось сформировать список покупок')
+        set_job(job_id, user_id, digest, FAILED, started)
+        return
+    set_shopping_list_pdf(digest, pdf)
+    set_job(job_id, user_id, digest, DONE, started)
+
+
+def start_pdf_export(user_id, items):
+    """Ставит формирование PDF списка покупок в очередь пула.
+
+    Если документ с таким содержимым уже в кэше, задача сразу
+    считается выполненной. Возвращает id задачи и ее состояние.
+    """
+    items = list(items)
+    created = timezone.localdate()
+    digest = make_shopping_list_digest(items, created)
+    job_id = uuid4().hex
+    started = time()
+    if get_shopping_list_pdf(digest) is not None:
+        set_job(job_id, user_id, digest, DONE, started)
+        return job_id, DONE
+    set_job(job_id, user_id, digest, PENDING, started)
+    future = get_executor().submit(render_pdf, items, created)
+    future.add_done_callback(
+        partial(finish_job, job_id, user_id, digest, started)
+    )
+    return job_id, PENDING
@@ -1,9 +1,15 @@
+from django.db.models import Exists, OuterRef
 from django_filters import rest_framework as filters
 
+from .registry import tag_registry
 from recipes.models import Ingredient, Recipe
 from users.models import User
 
 
+def tag_choices():
+    return [(slug, slug) for slug in tag_registry.get_ids_by_slug()]
+
+
 class IngredientFilter(filters.FilterSet):
     """Фильтр для модели ингредиентов."""
 
@@ -21,7 +27,9 @@ class RecipeFilter(filters.FilterSet):
     """Фильтр для модели рецептов."""
 
     author = filters.ModelChoiceFilter(queryset=User.objects.all())
-    tags = filters.AllValuesMultipleFilter(field_name='tags__slug')
+    tags = filters.MultipleChoiceFilter(
+        choices=tag_choices, method='filter_tags'
+    )
     is_favorited = filters.BooleanFilter(method='filter_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_cart'
@@ -36,12 +44,33 @@ class RecipeFilter(filters.FilterSet):
             'is_in_shopping_cart',
         )
 
+    def filter_tags(self, queryset, name, value):
+        """Фильтрация рецептов, у которых есть хотя бы один из тегов.
+
+        Слаги, пропавшие из реестра после проверки выбора, пропускаются.
+        """
+        if not value:
+            return queryset
+        tag_ids = tag_registry.get_ids_by_slug()
+        return queryset.filter(
+            Exists(
+                Recipe.tags.through.objects.filter(
+                    recipe_id=OuterRef('pk'),
+                    tag_id__in=[
+                        tag_ids[slug] for slug in value if slug in tag_ids
+                    ],
+                )
+            )
+        )
+
     def filter_is_favorited(self, queryset, name, value):
         """Фильтрация избранных рецептов."""
         if value:
-            return queryset.filter(favorite__user=self.request.user)
+            return queryset.filter(is_favorited=True)
+        return queryset
 
     def filter_is_in_shopping_cart(self, queryset, name, value):
         """Фильтрация рецептов в корзине покупок."""
         if value:
-            return queryset.filter(shoppingcart__user=self.request.user)
+            return queryset.filter(is_in_shopping_cart=True)
+        return queryset
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from api.cache import RECIPES, bump_version
+from api.representation import refresh_representations
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    """Пересобирает сохраненные представления рецептов."""
+
+    help = 'Пересобирает готовые JSON-представления рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Количество рецептов в одной пачке',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        recipe_ids = list(
+            Recipe.objects.order_by('pk').values_list('pk', flat=True)
+        )
+        for start in range(0, len(recipe_ids), batch_size):
+            refresh_representations(recipe_ids[start:start + batch_size])
+        bump_version(RECIPES)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Пересобраны представления рецептов: {len(recipe_ids)}'
+            )
+        )
@@ -0,0 +1,121 @@
+from hashlib import md5
+from time import time
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from .cache import get_last_modified, get_version
+
+
+class NotModified(Exception):
+    """Прерывает обработку запроса готовым ответом 304."""
+
+    def __init__(self, response):
+        super().__init__()
+        self.response = response
+
+
+class ConditionalGetMixin:
+    """Поддержка ETag и Last-Modified по версиям данных в кэше.
+
+    Вьюсет перечисляет в get_version_names наборы данных, от которых
+    зависит ответ. Если клиент прислал актуальные If-None-Match или
+    If-Modified-Since, ответ 304 отдается без обращения к базе данных.
+    Разные представления одного ресурса, например сжатые, различаются
+    суффиксом ETag из get_etag_suffix. Last-Modified точен до секунды,
+    поэтому он не отдается, пока не закончилась секунда последнего
+    изменения: иначе следующее изменение в ту же секунду осталось бы
+    незамеченным для If-Modified-Since.
+    """
+
+    conditional_actions = ('list', 'retrieve')
+    conditional_vary = ('Authorization',)
+
+    def get_version_names(self):
+        raise NotImplementedError
+
+    def get_etag_suffix(self, request):
+        return ''
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.conditional_state = None
+        if (
+            request.method not in ('GET', 'HEAD')
+            or self.action not in self.conditional_actions
+        ):
+            return
+        names = self.get_version_names()
+        versions = ':'.join(f'{name}={get_version(name)}' for name in names)
+        etag = quote_etag(
+            md5(
+                f'{versions}:{request.get_full_path()}'.encode()
+            ).hexdigest()
+            + self.get_etag_suffix(request)
+        )
+        last_modified = max(get_last_modified(name) for name in names)
+        if last_modified >= int(time()):
+            last_modified = None
+        self.conditional_state = (etag, last_modified)
+        response = get_conditional_response(
+            request._request, etag=etag, last_modified=last_modified
+        )
+        if response is not None:
+            raise NotModified(response)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return exc.response
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        state = getattr(self, 'conditional_state', None)
+        if state is not None and response.status_code in (200, 304):
+            etag, last_modified = state
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+            patch_vary_headers(response, self.conditional_vary)
+        return response
+
+
+class SparseFieldsetMixin:
+    """Выбор полей ответа параметрами fields и omit.
+
+    Поля перечисляются через запятую: ?fields=id,name или ?omit=text.
+    Неизвестные поля игнорируются.
+    """
+
+    sparse_fields = ()
+
+    def get_sparse_fields(self):
+        """Поля, доступные для выбора в текущем действии."""
+        return self.sparse_fields
+
+    def get_requested_fields(self):
+        """Возвращает выбранные клиентом поля или None."""
+        query_params = self.request.query_params
+        fields = query_params.get('fields')
+        omit = query_params.get('omit')
+        if not fields and not omit:
+            return None
+        requested = list(self.get_sparse_fields())
+        if fields:
+            selected = {name.strip() for name in fields.split(',')}
+            requested = [name for name in requested if name in selected]
+        if omit:
+            omitted = {name.strip() for name in omit.split(',')}
+            requested = [name for name in requested if name not in omitted]
+        return requested
+
+    def is_field_requested(self, name):
+        fields = self.get_requested_fields()
+        return fields is None or name in fields
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fields'] = self.get_requested_fields()
+        return context
@@ -0,0 +1,67 @@
+from django.db.models import Exists, F, OuterRef, Prefetch, Value, Window
+from django.db.models.functions import RowNumber
+
+from recipes.models import Favorite, Recipe, RecipeIngredient, ShoppingCart
+from users.models import Subscribe, User
+
+
+def annotate_is_subscribed(queryset, user):
+    """Добавляет к авторам признак подписки текущего пользователя."""
+    if user.is_anonymous:
+        return queryset.annotate(is_subscribed=Value(False))
+    return queryset.annotate(
+        is_subscribed=Exists(
+            Subscribe.objects.filter(user=user, author=OuterRef('pk'))
+        )
+    )
+
+
+def annotate_recipe_flags(queryset, user):
+    """Добавляет к рецептам признаки избранного и корзины пользователя."""
+    if user.is_anonymous:
+        return queryset.annotate(
+            is_favorited=Value(False),
+            is_in_shopping_cart=Value(False),
+        )
+    return queryset.annotate(
+        is_favorited=Exists(
+            Favorite.objects.filter(user=user, recipe=OuterRef('pk'))
+        ),
+        is_in_shopping_cart=Exists(
+            ShoppingCart.objects.filter(user=user, recipe=OuterRef('pk'))
+        ),
+    )
+
+
+def prefetch_recipe_relations(queryset, user):
+    """Подгружает теги, автора и ингредиенты рецептов."""
+    return queryset.prefetch_related(
+        'tags',
+        Prefetch(
+            'author',
+            queryset=annotate_is_subscribed(User.objects.all(), user),
+        ),
+        Prefetch(
+            'ingredient_amount',
+            queryset=RecipeIngredient.objects.select_related('ingredient'),
+        ),
+    )
+
+
+def prefetch_author_recipes(queryset, limit=None):
+    """Подгружает не более limit последних рецептов каждого автора.
+
+    Ограничение применяется в том же запросе через ROW_NUMBER()
+    OVER (PARTITION BY author_id), а не отдельным запросом на автора.
+    """
+    order_by = ('-pub_date', '-id')
+    recipes = Recipe.objects.only(
+        'id', 'author_id', 'name', 'image', 'cooking_time'
+    ).order_by(*order_by)
+    if limit is not None:
+        recipes = recipes.annotate(
+            row_number=Window(
+                RowNumber(), partition_by=F('author_id'), order_by=order_by
+            )
+        ).filter(row_number__lte=limit)
+    return queryset.prefetch_related(Prefetch('recipes', queryset=recipes))
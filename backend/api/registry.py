@@ -0,0 +1,57 @@
+from threading import Lock
+
+from .cache import TAGS, get_version
+from recipes.models import Tag
+
+
+class VersionedRegistry:
+    """Данные в памяти процесса, сверяемые с версией в общем кэше.
+
+    Перед каждым обращением версия набора данных читается из кэша;
+    если она изменилась, данные загружаются заново методом load.
+    """
+
+    version_name = None
+
+    def __init__(self):
+        self.version = None
+        self.lock = Lock()
+
+    def load(self):
+        raise NotImplementedError
+
+    def refresh(self):
+        version = get_version(self.version_name)
+        if version == self.version:
+            return
+        with self.lock:
+            if version == self.version:
+                return
+            self.load()
+            self.version = version
+
+
+class TagRegistry(VersionedRegistry):
+    """Все теги, загруженные один раз на процесс."""
+
+    version_name = TAGS
+
+    def load(self):
+        self.tags = list(Tag.objects.values('id', 'name', 'color', 'slug'))
+        self.tags_by_id = {tag['id']: tag for tag in self.tags}
+        self.ids_by_slug = {tag['slug']: tag['id'] for tag in self.tags}
+
+    def all(self):
+        self.refresh()
+        return self.tags
+
+    def get(self, pk):
+        self.refresh()
+        return self.tags_by_id.get(pk)
+
+    def get_ids_by_slug(self):
+        self.refresh()
+        return self.ids_by_slug
+
+
+tag_registry = TagRegistry()
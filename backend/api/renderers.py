@@ -0,0 +1,117 @@
+import csv
+import json
+from io import BytesIO
+
+from django.utils import timezone
+from rest_framework.renderers import BaseRenderer
+
+from .cache import (
+    get_shopping_list_pdf,
+    make_shopping_list_digest,
+    set_shopping_list_pdf,
+)
+from .utils import create_shopping_list_pdf
+
+CHUNK_SIZE = 64 * 1024
+
+
+def iter_chunks(content):
+    """Отдает готовый документ частями по CHUNK_SIZE байт."""
+    buffer = BytesIO(content)
+    yield from iter(lambda: buffer.read(CHUNK_SIZE), b'')
+
+
+class ShoppingListRenderer(BaseRenderer):
+    """Базовый класс выгрузки списка покупок.
+
+    Список формируется построчно методом stream, поэтому его можно
+    отдавать через StreamingHttpResponse без сборки в памяти.
+    """
+
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return b''.join(self.stream(data))
+
+    def get_content_type(self):
+        if self.charset:
+            return f'{self.media_type}; charset={self.charset}'
+        return self.media_type
+
+    def stream(self, items):
+        raise NotImplementedError
+
+
+class PDFShoppingListRenderer(ShoppingListRenderer):
+    """Список покупок в PDF.
+
+    Готовые документы кэшируются по хэшу строк списка, поэтому повторная
+    загрузка неизменного списка не формирует PDF заново.
+    """
+
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+
+    def stream(self, items):
+        items = list(items)
+        created = timezone.localdate()
+        digest = make_shopping_list_digest(items, created)
+        pdf = get_shopping_list_pdf(digest)
+        if pdf is None:
+            pdf = create_shopping_list_pdf(items, created).getvalue()
+            set_shopping_list_pdf(digest, pdf)
+        yield from iter_chunks(pdf)
+
+
+class PlainTextShoppingListRenderer(ShoppingListRenderer):
+    """Список покупок простым текстом."""
+
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def stream(self, items):
+        yield 'Список ингредиентов для рецептов\n\n'.encode()
+        for number, item in enumerate(items, start=1):
+            yield (
+                f"{number}. {item['name']}, {item['amount']} "
+                f"{item['measurement_unit']}.\n"
+            ).encode()
+
+
+class Echo:
+    """Файлоподобный объект, возвращающий записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+class CSVShoppingListRenderer(ShoppingListRenderer):
+    """Список покупок в CSV."""
+
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, items):
+        writer = csv.writer(Echo())
+        yield writer.writerow(('name', 'amount', 'measurement_unit')).encode()
+        for item in items:
+            yield writer.writerow(
+                (item['name'], item['amount'], item['measurement_unit'])
+            ).encode()
+
+
+class JSONShoppingListRenderer(ShoppingListRenderer):
+    """Список покупок в JSON."""
+
+    media_type = 'application/json'
+    format = 'json'
+
+    def stream(self, items):
+        separator = '['
+        for item in items:
+            yield (
+                separator + json.dumps(item, ensure_ascii=False)
+            ).encode()
+            separator = ','
+        yield ('[]' if separator == '[' else ']').encode()
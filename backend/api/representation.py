@@ -0,0 +1,137 @@
+from threading import local
+
+from django.contrib.auth.models import AnonymousUser
+from django.db import transaction
+
+from .cache import RECIPES, bump_version
+from .querysets import prefetch_recipe_relations
+from .serializers import RecipeListSerializer
+from recipes.images import get_variant_urls
+from recipes.models import Recipe
+
+NESTED_FIELDS = ('tags', 'author', 'ingredients')
+FLAG_FIELDS = ('is_favorited', 'is_in_shopping_cart')
+COLUMN_FIELDS = ('id', 'name', 'image', 'text', 'cooking_time')
+REPRESENTATION_FIELDS = frozenset(RecipeListSerializer.Meta.fields)
+
+_pending = local()
+
+
+def build_representation(recipe):
+    """Строит общее для всех пользователей представление рецепта."""
+    serializer = RecipeListSerializer(recipe, context={'shared': True})
+    return serializer.data
+
+
+def refresh_representations(recipe_ids):
+    """Пересобирает сохраненные представления рецептов."""
+    recipes = list(
+        prefetch_recipe_relations(
+            Recipe.objects.filter(pk__in=recipe_ids), AnonymousUser()
+        )
+    )
+    for recipe in recipes:
+        recipe.representation = build_representation(recipe)
+    Recipe.objects.bulk_update(recipes, ('representation',))
+    return recipes
+
+
+def flush_pending_refresh():
+    recipe_ids = getattr(_pending, 'recipe_ids', None)
+    _pending.recipe_ids = set()
+    if recipe_ids:
+        refresh_representations(recipe_ids)
+        bump_version(RECIPES)
+
+
+def schedule_refresh(recipe_ids):
+    """Откладывает пересборку представлений до фиксации транзакции."""
+    recipe_ids = set(recipe_ids)
+    if not recipe_ids:
+        return
+    pending = getattr(_pending, 'recipe_ids', None)
+    if pending is None:
+        pending = _pending.recipe_ids = set()
+    pending.update(recipe_ids)
+    transaction.on_commit(flush_pending_refresh)
+
+
+def make_urls_absolute(representation, request):
+    """Делает адреса изображений абсолютными для текущего запроса."""
+    if request is None:
+        return representation
+    if 'image' in representation:
+        representation['image'] = request.build_absolute_uri(
+            representation['image']
+        )
+    if 'image_variants' in representation:
+        representation['image_variants'] = {
+            variant: request.build_absolute_uri(url)
+            for variant, url in representation['image_variants'].items()
+        }
+    return representation
+
+
+def with_flag_key(fields):
+    """Добавляет к выбранным полям id, нужный для признаков пользователя."""
+    if fields is None or 'id' in fields or not set(fields) & set(FLAG_FIELDS):
+        return fields
+    return ['id', *fields]
+
+
+def get_recipe_columns(fields):
+    """Колонки рецепта, нужные для выбранных полей ответа."""
+    if fields is None or set(fields) & set(NESTED_FIELDS):
+        return ('id', 'pub_date', 'representation')
+    columns = {'id', 'pub_date'}
+    columns.update(field for field in fields if field in COLUMN_FIELDS)
+    if 'image_variants' in fields:
+        columns.add('image')
+    return tuple(columns)
+
+
+def get_column_representations(recipes, request, fields):
+    """Строит ответ из колонок рецепта, не читая представление."""
+    data = []
+    for recipe in recipes:
+        representation = {}
+        for field in fields:
+            if field in COLUMN_FIELDS:
+                representation[field] = getattr(recipe, field)
+            elif field == 'image_variants':
+                representation[field] = get_variant_urls(recipe.image)
+            else:
+                representation[field] = False
+        if 'image' in representation:
+            representation['image'] = recipe.image.url
+        data.append(make_urls_absolute(representation, request))
+    return data
+
+
+def get_representations(recipes, request, fields=None):
+    """Возвращает копии сохраненных представлений рецептов."""
+    if fields is not None and not set(fields) & set(NESTED_FIELDS):
+        return get_column_representations(recipes, request, fields)
+    missing = [
+        recipe.pk
+        for recipe in recipes
+        if not REPRESENTATION_FIELDS <= recipe.representation.keys()
+    ]
+    if missing:
+        rebuilt = {
+            recipe.pk: recipe.representation
+            for recipe in refresh_representations(missing)
+        }
+        for recipe in recipes:
+            if recipe.pk in rebuilt:
+                recipe.representation = rebuilt[recipe.pk]
+    data = []
+    for recipe in recipes:
+        representation = dict(recipe.representation)
+        representation['author'] = dict(representation['author'])
+        if fields is not None:
+            representation = {
+                field: representation[field] for field in fields
+            }
+        data.append(make_urls_absolute(representation, request))
+    return data
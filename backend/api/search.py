@@ -0,0 +1,58 @@
+from bisect import bisect_left
+
+from .cache import INGREDIENTS
+from .registry import VersionedRegistry
+from recipes.models import Ingredient
+
+
+def normalize(value):
+    """Приводит строку к виду для поиска без учета регистра и ё."""
+    return value.casefold().replace('ё', 'е')
+
+
+class IngredientIndex(VersionedRegistry):
+    """Индекс каталога ингредиентов в памяти процесса.
+
+    Названия хранятся отсортированными, поэтому совпадения по началу
+    строки находятся двоичным поиском. Совпадения по подстроке идут
+    после них. Индекс перестраивается, когда меняется версия
+    каталога ингредиентов в общем кэше.
+    """
+
+    version_name = INGREDIENTS
+
+    def load(self):
+        entries = sorted(
+            (normalize(item['name']), item['id'], item)
+            for item in Ingredient.objects.values(
+                'id', 'name', 'measurement_unit'
+            )
+        )
+        self.keys = [key for key, _, _ in entries]
+        self.items = [item for _, _, item in entries]
+
+    def search(self, query, limit):
+        """Ищет ингредиенты по началу названия, затем по подстроке."""
+        self.refresh()
+        query = normalize(query.strip())
+        if not query:
+            return []
+        keys, items = self.keys, self.items
+        found = []
+        start = bisect_left(keys, query)
+        end = start
+        while end < len(keys) and keys[end].startswith(query):
+            end += 1
+        found.extend(items[start:min(end, start + limit)])
+        if len(found) >= limit:
+            return found
+        for index, key in enumerate(keys):
+            if start <= index < end or query not in key:
+                continue
+            found.append(items[index])
+            if len(found) >= limit:
+                break
+        return found
+
+
+ingredient_index = IngredientIndex()
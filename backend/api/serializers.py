@@ -1,17 +1,56 @@
+import json
+from pathlib import PurePosixPath
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.db import IntegrityError, transaction
+from django.db.models import Value
 from django.shortcuts import get_object_or_404
 from djoser.serializers import UserCreateSerializer as BaseUserCreateSerializer
 from djoser.serializers import UserSerializer as BaseUserSerializer
 from drf_base64.fields import Base64ImageField
 from rest_framework import serializers
+from rest_framework.settings import api_settings
+from rest_framework.utils import html
 
+from .querysets import prefetch_author_recipes
+from .registry import tag_registry
 from .validators import (
     ColorFieldValidator,
     CookingTimeRecipeFieldValidator,
     RecipeIngredientFieldValidator,
     UsernameFieldValidator,
 )
-from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
-from users.models import User
+from recipes.images import get_variant_urls
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCart,
+    Tag,
+)
+from recipes.shopping_list import track_recipe_ingredients
+from users.models import Subscribe, User
+
+
+class SparseFieldsSerializerMixin:
+    """Оставляет в корневом сериализаторе только поля из context['fields']."""
+
+    def get_fields(self):
+        fields = super().get_fields()
+        requested = self.context.get('fields')
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        if requested is None or parent is not None:
+            return fields
+        return {
+            name: field
+            for name, field in fields.items()
+            if name in requested
+        }
 
 
 class UserCreateSerializer(BaseUserCreateSerializer):
@@ -30,7 +69,7 @@ class UserCreateSerializer(BaseUserCreateSerializer):
         )
 
 
-class UserListSerializer(BaseUserSerializer):
+class UserListSerializer(SparseFieldsSerializerMixin, BaseUserSerializer):
     """Сериализатор для подписанных пользователей."""
 
     is_subscribed = serializers.SerializerMethodField()
@@ -47,19 +86,27 @@ class UserListSerializer(BaseUserSerializer):
         )
 
     def to_representation(self, instance):
+        if self.context.get('shared'):
+            return super().to_representation(instance)
         user = self.context.get('request').user
 
         if user.is_authenticated:
             return super().to_representation(instance)
         data = super().to_representation(instance)
-        data['email'], data['username'] = None, None
+        for field in ('email', 'username'):
+            if field in data:
+                data[field] = None
         return data
 
     def get_is_subscribed(self, author):
+        if self.context.get('shared'):
+            return False
+        if hasattr(author, 'is_subscribed'):
+            return author.is_subscribed
         user = self.context.get('request').user
-        return (
-            user.is_anonymous and author.subscribed.filter(user=user).exists()
-        )
+        if user.is_anonymous:
+            return False
+        return author.subscribed.filter(user=user).exists()
 
 
 class UserSetPasswordSerializer(serializers.Serializer):
@@ -69,24 +116,44 @@ class UserSetPasswordSerializer(serializers.Serializer):
     current_password = serializers.CharField(required=True, write_only=True)
 
 
+class ImageVariantsField(serializers.Field):
+    """Адреса уменьшенных копий изображения рецепта."""
+
+    def __init__(self, **kwargs):
+        kwargs['source'] = 'image'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        urls = get_variant_urls(value)
+        request = self.context.get('request')
+        if request is None:
+            return urls
+        return {
+            variant: request.build_absolute_uri(url)
+            for variant, url in urls.items()
+        }
+
+
 class RecipeListShortSerializer(serializers.ModelSerializer):
     """Сериализатор для отображения краткой информации о рецептах."""
 
     image = Base64ImageField(required=True)
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_variants', 'cooking_time')
 
 
-class SubscriptionSerializer(serializers.ModelSerializer):
+class SubscriptionSerializer(
+    SparseFieldsSerializerMixin, serializers.ModelSerializer
+):
     """Сериализатор для перечисления подписок пользователей."""
 
     is_subscribed = serializers.SerializerMethodField()
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.IntegerField(
-        source='recipes.count', read_only=True
-    )
+    recipes_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = User
@@ -102,26 +169,23 @@ class SubscriptionSerializer(serializers.ModelSerializer):
         )
 
     def get_is_subscribed(self, author):
+        if self.context.get('shared'):
+            return False
+        if hasattr(author, 'is_subscribed'):
+            return author.is_subscribed
         user = self.context.get('request').user
-        return (
-            user.is_anonymous and author.subscribed.filter(user=user).exists()
-        )
+        if user.is_anonymous:
+            return False
+        return author.subscribed.filter(user=user).exists()
 
     def get_recipes(self, author):
         request = self.context.get('request')
-        user = self.context.get('request').user
-        if user.is_anonymous:
+        if request.user.is_anonymous:
             return None
-
-        recipes = author.recipes.filter(author=author)
-        recipes_limit = request.query_params.get('recipes_limit')
-
-        if recipes_limit:
-            recipes = recipes[: int(recipes_limit)]
-        else:
-            recipes = recipes.all()
         return RecipeListShortSerializer(
-            instance=recipes, many=True, context={'request': request}
+            instance=author.recipes.all(),
+            many=True,
+            context={'request': request},
         ).data
 
 
@@ -130,21 +194,32 @@ class SubscribeSerializer(serializers.Serializer):
 
     def validate(self, data):
         user = self.context.get('request').user
-        author = get_object_or_404(User, pk=self.context.get('id'))
-        if user == author:
+        if str(user.pk) == str(self.context.get('id')):
             raise serializers.ValidationError(
                 'Вы не можете подписаться на себя самого'
             )
-        if author.subscribed.filter(user=user).exists():
-            raise serializers.ValidationError(
-                'Вы уже подписаны на этого пользователя'
-            )
         return data
 
     def create(self, validated_data):
         user = self.context.get('request').user
-        author = get_object_or_404(User, pk=validated_data.get('id'))
-        author.subscribed.create(user=user)
+        author = get_object_or_404(
+            prefetch_author_recipes(
+                User.objects.annotate(is_subscribed=Value(True)),
+                self.context.get('recipes_limit'),
+            ),
+            pk=validated_data.get('id'),
+        )
+        try:
+            with transaction.atomic():
+                Subscribe.objects.create(user=user, author=author)
+        except IntegrityError:
+            raise serializers.ValidationError(
+                {
+                    api_settings.NON_FIELD_ERRORS_KEY: [
+                        'Вы уже подписаны на этого пользователя'
+                    ]
+                }
+            )
         return SubscriptionSerializer(
             instance=author, context={'request': self.context.get('request')}
         ).data
@@ -202,6 +277,7 @@ class RecipeListSerializer(serializers.ModelSerializer):
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
     image = Base64ImageField(required=True)
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Recipe
@@ -214,28 +290,52 @@ class RecipeListSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'image_variants',
             'text',
             'cooking_time',
         )
 
     def get_is_favorited(self, recipe):
+        if self.context.get('shared'):
+            return False
+        if hasattr(recipe, 'is_favorited'):
+            return recipe.is_favorited
         user = self.context.get('request').user
         if user.is_anonymous:
-            return None
+            return False
         return recipe.favorite.filter(user=user).exists()
 
     def get_is_in_shopping_cart(self, recipe):
+        if self.context.get('shared'):
+            return False
+        if hasattr(recipe, 'is_in_shopping_cart'):
+            return recipe.is_in_shopping_cart
         user = self.context.get('request').user
-        return user.is_anonymous and recipe.shoppingcart(user=user).exists()
+        if user.is_anonymous:
+            return False
+        return recipe.shoppingcart.filter(user=user).exists()
+
+
+class TagIdsField(serializers.ListField):
+    """Список id тегов, проверяемых по реестру тегов в памяти."""
+
+    child = serializers.IntegerField()
+
+    def to_internal_value(self, data):
+        tag_ids = super().to_internal_value(data)
+        for tag_id in tag_ids:
+            if tag_registry.get(tag_id) is None:
+                raise serializers.ValidationError(
+                    f'Тега с id {tag_id} не существует'
+                )
+        return tag_ids
 
 
 class RecipeCreateSerializer(serializers.ModelSerializer):
     """Сериалайзер для списка рецептов."""
 
     ingredients = RecipeIngredientAddSerializer(many=True)
-    tags = serializers.PrimaryKeyRelatedField(
-        many=True, queryset=Tag.objects.all()
-    )
+    tags = TagIdsField()
     image = Base64ImageField(required=True)
     cooking_time = CookingTimeRecipeFieldValidator()
 
@@ -250,6 +350,43 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             'cooking_time',
         )
 
+    def to_internal_value(self, data):
+        if html.is_html_input(data):
+            data = self.parse_multipart(data)
+        return super().to_internal_value(data)
+
+    def parse_multipart(self, data):
+        """Приводит данные multipart/form-data к виду JSON-запроса.
+
+        Ингредиенты передаются JSON-строкой, теги - JSON-строкой
+        или повторяющимся полем tags.
+        """
+        parsed = {}
+        for field in data:
+            if field not in ('ingredients', 'tags'):
+                parsed[field] = data.get(field)
+                continue
+            values = data.getlist(field)
+            if len(values) == 1 and values[0].lstrip().startswith('['):
+                try:
+                    values = json.loads(values[0])
+                except ValueError:
+                    raise serializers.ValidationError(
+                        {field: 'Некорректный JSON'}
+                    )
+            elif field == 'ingredients':
+                raise serializers.ValidationError(
+                    {field: 'Ингредиенты передаются JSON-списком'}
+                )
+            parsed[field] = values
+        return parsed
+
+    def validate_image(self, image):
+        if isinstance(image, UploadedFile):
+            suffix = PurePosixPath(image.name).suffix.lower()
+            image.name = f'{uuid4()}{suffix}'
+        return image
+
     def validate_ingredients(self, ingredients_data):
         unique_ingredients = set()
         for ingredient_data in ingredients_data:
@@ -275,6 +412,7 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             ingredients.append(recipe_ingredient)
         RecipeIngredient.objects.bulk_create(ingredients)
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients_data = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
@@ -283,14 +421,21 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         self.set_ingredients(recipe, ingredients_data)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         recipe = instance
-        ingredients = validated_data.pop('ingredients', [])
-        tags = validated_data.pop('tags')
-        RecipeIngredient.objects.filter(recipe=recipe).delete()
-        recipe.tags.set(tags)
-        self.set_ingredients(recipe, ingredients)
-        return super().update(recipe, validated_data)
+        ingredients = validated_data.pop('ingredients', None)
+        tags = validated_data.pop('tags', None)
+        if ingredients is not None:
+            with track_recipe_ingredients(recipe.pk):
+                RecipeIngredient.objects.filter(recipe=recipe).delete()
+                self.set_ingredients(recipe, ingredients)
+        if tags is not None:
+            recipe.tags.set(tags)
+        for field, value in validated_data.items():
+            setattr(recipe, field, value)
+        recipe.save(update_fields=validated_data.keys())
+        return recipe
 
     def to_representation(self, instance):
         serializer = RecipeListSerializer(
@@ -299,43 +444,57 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         return serializer.data
 
 
-class FavoriteSerializer(serializers.Serializer):
-    """Сериалайзер для добавления рецепта в избранное."""
+class BatchIdsSerializer(serializers.Serializer):
+    """Сериалайзер списка id для пакетных операций."""
 
-    def validate(self, data):
-        user = self.context.get('request').user
-        recipe_id = self.context.get('recipe_id')
-        if user.favorite.filter(recipe_id=recipe_id).exists():
-            raise serializers.ValidationError(
-                'Вы уже добавили этот рецепт в избранное'
-            )
-        return data
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BATCH_MAX_SIZE,
+    )
 
-    def create(self, validated_data):
-        user = self.context.get('request').user
-        recipe = get_object_or_404(Recipe, pk=validated_data.get('id'))
-        recipe.favorite.create(user=user)
-        return RecipeListShortSerializer(
-            instance=recipe, context={'request': self.context.get('request')}
-        ).data
 
+class UserRecipeSerializer(serializers.Serializer):
+    """Базовый сериалайзер добавления рецепта в список пользователя.
 
-class ShoppingCartSerializer(serializers.Serializer):
-    """Сериалайзер для добавления в корзину."""
+    Повторное добавление отсекает уникальное ограничение модели, а не
+    предварительная проверка exists().
+    """
 
-    def validate(self, data):
-        user = self.context.get('request').user
-        recipe_id = self.context.get('recipe_id')
-        if user.shoppingcart.filter(recipe_id=recipe_id).exists():
-            raise serializers.ValidationError(
-                'Вы уже добавили этот рецепт в список покупок'
-            )
-        return data
+    model = None
+    already_added_message = None
 
     def create(self, validated_data):
-        user = self.context.get('request').user
-        recipe = get_object_or_404(Recipe, pk=validated_data.get('id'))
-        recipe.shoppingcart.create(user=user)
+        request = self.context.get('request')
+        recipe = get_object_or_404(
+            Recipe.objects.only('id', 'name', 'image', 'cooking_time'),
+            pk=validated_data.get('id'),
+        )
+        try:
+            with transaction.atomic():
+                self.model.objects.create(user=request.user, recipe=recipe)
+        except IntegrityError:
+            raise serializers.ValidationError(
+                {
+                    api_settings.NON_FIELD_ERRORS_KEY: [
+                        self.already_added_message
+                    ]
+                }
+            )
         return RecipeListShortSerializer(
-            instance=recipe, context={'request': self.context.get('request')}
+            instance=recipe, context={'request': request}
         ).data
+
+
+class FavoriteSerializer(UserRecipeSerializer):
+    """Сериалайзер для добавления рецепта в избранное."""
+
+    model = Favorite
+    already_added_message = 'Вы уже добавили этот рецепт в избранное'
+
+
+class ShoppingCartSerializer(UserRecipeSerializer):
+    """Сериалайзер для добавления в корзину."""
+
+    model = ShoppingCart
+    already_added_message = 'Вы уже добавили этот рецепт в список покупок'
@@ -0,0 +1,156 @@
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+)
+from django.dispatch import receiver
+from import_export.signals import post_import
+
+from .cache import INGREDIENTS, RECIPES, TAGS, bump_version, reset_user_flags
+from .representation import schedule_refresh
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCart,
+    Tag,
+)
+from users.models import Subscribe, User
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipes_cache(sender, **kwargs):
+    """Сбрасывает кэш страниц рецептов после изменения данных."""
+    action = kwargs.get('action')
+    if action and not action.startswith('post_'):
+        return
+    transaction.on_commit(lambda: bump_version(RECIPES))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_tags_cache(sender, **kwargs):
+    """Сдвигает версию списка тегов."""
+    transaction.on_commit(lambda: bump_version(TAGS))
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_ingredients_cache(sender, **kwargs):
+    """Сдвигает версию каталога ингредиентов."""
+    transaction.on_commit(lambda: bump_version(INGREDIENTS))
+
+
+@receiver(post_import)
+def invalidate_cache_on_import(sender, model, **kwargs):
+    """Сдвигает версии после импорта через админку."""
+    if model is Ingredient:
+        transaction.on_commit(lambda: bump_version(INGREDIENTS))
+    if model is Tag:
+        transaction.on_commit(lambda: bump_version(TAGS))
+    transaction.on_commit(lambda: bump_version(RECIPES))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_recipes_cache_on_author_change(sender, **kwargs):
+    """Сбрасывает кэш рецептов после изменения данных автора."""
+    update_fields = kwargs.get('update_fields')
+    if kwargs.get('created') or (
+        update_fields and set(update_fields) <= {'last_login', 'password'}
+    ):
+        return
+    transaction.on_commit(lambda: bump_version(RECIPES))
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_delete, sender=ShoppingCart)
+@receiver(post_save, sender=Subscribe)
+@receiver(post_delete, sender=Subscribe)
+def invalidate_user_flags(sender, instance, **kwargs):
+    """Сбрасывает кэш избранного, корзины и подписок пользователя.
+
+    Если строку передали другому пользователю, сбрасывается и кэш
+    прежнего владельца.
+    """
+    user_ids = {instance.user_id}
+    previous = getattr(instance, 'previous_row', None)
+    if previous is not None:
+        user_ids.add(previous[0])
+    for user_id in user_ids:
+        transaction.on_commit(
+            lambda user_id=user_id: reset_user_flags(user_id)
+        )
+
+
+@receiver(post_save, sender=Recipe)
+def refresh_recipe_representation(sender, instance, **kwargs):
+    """Пересобирает представление сохраненного рецепта."""
+    update_fields = kwargs.get('update_fields')
+    if update_fields and set(update_fields) <= {'representation'}:
+        return
+    schedule_refresh({instance.pk})
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def refresh_representation_on_ingredients_change(sender, instance, **kwargs):
+    """Пересобирает представление рецепта при изменении ингредиентов."""
+    schedule_refresh({instance.recipe_id})
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def refresh_representation_on_tags_change(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    """Пересобирает представления рецептов при изменении их тегов."""
+    if not reverse:
+        if action.startswith('post_'):
+            schedule_refresh({instance.pk})
+    elif action == 'pre_clear':
+        schedule_refresh(instance.recipes.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove'):
+        schedule_refresh(pk_set)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def refresh_representation_on_tag_change(sender, instance, **kwargs):
+    """Пересобирает представления рецептов с измененным тегом."""
+    schedule_refresh(instance.recipes.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Ingredient)
+def refresh_representation_on_ingredient_change(sender, instance, **kwargs):
+    """Пересобирает представления рецептов с измененным ингредиентом."""
+    if kwargs.get('created'):
+        return
+    schedule_refresh(
+        RecipeIngredient.objects.filter(ingredient=instance).values_list(
+            'recipe_id', flat=True
+        )
+    )
+
+
+@receiver(post_save, sender=User)
+def refresh_representation_on_author_change(sender, instance, **kwargs):
+    """Пересобирает представления рецептов измененного автора."""
+    update_fields = kwargs.get('update_fields')
+    if kwargs.get('created') or (
+        update_fields and set(update_fields) <= {'last_login', 'password'}
+    ):
+        return
+    schedule_refresh(instance.recipes.values_list('pk', flat=True))
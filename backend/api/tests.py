@@ -0,0 +1,134 @@
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import skipUnless
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.models import Q
+from django.test import TestCase, override_settings
+from PIL import Image
+from rest_framework.test import APITestCase
+
+from .filters import IngredientFilter
+from recipes.models import Favorite, Ingredient, Recipe
+from users.models import Subscribe, User
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@skipUnless(
+    connection.vendor == 'postgresql',
+    'Индексы поиска есть только в PostgreSQL',
+)
+class SearchIndexTests(TestCase):
+    """Поиск по ингредиентам и пользователям использует индексы."""
+
+    @classmethod
+    def setUpTestData(cls):
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(1000)
+        )
+        User.objects.bulk_create(
+            User(
+                email=f'user{number}@example.com',
+                username=f'user{number}',
+                first_name='Имя',
+                last_name='Фамилия',
+            )
+            for number in range(1000)
+        )
+
+    def setUp(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+            cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def assertUsesIndex(self, queryset, *index_names):
+        plan = queryset.explain()
+        self.assertNotIn('Seq Scan', plan)
+        for index_name in index_names:
+            self.assertIn(index_name, plan)
+
+    def test_ingredient_name_istartswith(self):
+        queryset = IngredientFilter(
+            {'name': 'ингредиент 12'}, queryset=Ingredient.objects.all()
+        ).qs
+        self.assertUsesIndex(queryset, 'ingredient_name_upper_idx')
+
+    def test_ingredient_name_icontains(self):
+        queryset = Ingredient.objects.filter(name__icontains='диент 12')
+        self.assertUsesIndex(queryset, 'ingredient_name_trgm_idx')
+
+    def test_user_search_icontains(self):
+        queryset = User.objects.filter(
+            Q(email__icontains='ser12') | Q(username__icontains='ser12')
+        )
+        self.assertUsesIndex(
+            queryset, 'user_email_trgm_idx', 'user_username_trgm_idx'
+        )
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class RecipeFieldsTests(APITestCase):
+    """Выбор полей ответа с признаками пользователя без id."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='reader@example.com',
+            username='reader',
+            first_name='Имя',
+            last_name='Фамилия',
+            password='password',
+        )
+        author = User.objects.create_user(
+            email='author@example.com',
+            username='author',
+            first_name='Имя',
+            last_name='Фамилия',
+            password='password',
+        )
+        buffer = BytesIO()
+        Image.new('RGB', (10, 10)).save(buffer, 'PNG')
+        cls.recipe = Recipe.objects.create(
+            author=author,
+            name='Рецепт',
+            text='Описание',
+            cooking_time=10,
+            image=SimpleUploadedFile('recipe.png', buffer.getvalue()),
+        )
+        Favorite.objects.create(user=cls.user, recipe=cls.recipe)
+        Subscribe.objects.create(user=cls.user, author=author)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.user)
+
+    def test_flags_without_id(self):
+        urls = (
+            '/api/recipes/',
+            f'/api/recipes/{self.recipe.id}/',
+            '/api/recipes/feed/',
+        )
+        for url in urls:
+            for query in (
+                'fields=is_favorited',
+                'fields=name,is_in_shopping_cart',
+                'omit=id',
+            ):
+                with self.subTest(url=url, query=query):
+                    response = self.client.get(f'{url}?{query}')
+                    self.assertEqual(response.status_code, 200)
+                    data = response.data
+                    recipe = data['results'][0] if 'results' in data else data
+                    self.assertNotIn('id', recipe)
+                    if 'is_favorited' in recipe:
+                        self.assertTrue(recipe['is_favorited'])
@@ -1,12 +1,61 @@
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.conf import settings
+from django.db.models import F, Value
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters, mixins, permissions, status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.generics import get_object_or_404
+from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 
+from .batch import (
+    add_recipes,
+    remove_recipes,
+    subscribe_authors,
+    unsubscribe_authors,
+)
+from .cache import (
+    INGREDIENTS,
+    RECIPES,
+    TAGS,
+    apply_user_flags,
+    get_recipes_page,
+    get_shopping_list_pdf,
+    get_version,
+    make_page_key,
+    set_recipes_page,
+    user_flags_version_name,
+)
+from .catalog import CATALOG_ENCODINGS, choose_encoding, get_catalog
+from .exports import FAILED, PENDING, get_job, start_pdf_export
 from .filters import IngredientFilter, RecipeFilter
+from .mixins import ConditionalGetMixin, SparseFieldsetMixin
+from .pagination import RecipeCursorPagination
+from .querysets import (
+    annotate_is_subscribed,
+    annotate_recipe_flags,
+    prefetch_author_recipes,
+    prefetch_recipe_relations,
+)
+from .registry import tag_registry
+from .renderers import (
+    CSVShoppingListRenderer,
+    JSONShoppingListRenderer,
+    PDFShoppingListRenderer,
+    PlainTextShoppingListRenderer,
+    iter_chunks,
+)
+from .representation import (
+    get_recipe_columns,
+    get_representations,
+    with_flag_key,
+)
+from .search import ingredient_index
 from .serializers import (
+    BatchIdsSerializer,
     FavoriteSerializer,
     IngredientSerializer,
     RecipeCreateSerializer,
@@ -19,19 +68,19 @@ from .serializers import (
     UserListSerializer,
     UserSetPasswordSerializer,
 )
-from .utils import create_shopping_list_pdf
 from recipes.models import (
     Favorite,
     Ingredient,
     Recipe,
-    RecipeIngredient,
     ShoppingCart,
+    ShoppingListItem,
     Tag,
 )
 from users.models import Subscribe, User
 
 
 class UserViewSet(
+    SparseFieldsetMixin,
     mixins.CreateModelMixin,
     mixins.ListModelMixin,
     mixins.RetrieveModelMixin,
@@ -43,6 +92,17 @@ class UserViewSet(
     filter_backends = (DjangoFilterBackend, filters.SearchFilter)
     search_fields = ('email', 'username')
     filterset_fields = ('email', 'username')
+    sparse_fields = UserListSerializer.Meta.fields
+
+    def get_sparse_fields(self):
+        if self.action == 'subscriptions':
+            return SubscriptionSerializer.Meta.fields
+        return super().get_sparse_fields()
+
+    def get_queryset(self):
+        if not self.is_field_requested('is_subscribed'):
+            return User.objects.all()
+        return annotate_is_subscribed(User.objects.all(), self.request.user)
 
     def get_permissions(self):
         """Получение прав доступа для каждого действия."""
@@ -69,6 +129,7 @@ class UserViewSet(
             'set_password': UserSetPasswordSerializer,
             'subscriptions': SubscriptionSerializer,
             'subscribe': SubscribeSerializer,
+            'batch_subscribe': BatchIdsSerializer,
         }
         return serializer_class_dict.get(self.action)
 
@@ -97,20 +158,38 @@ class UserViewSet(
                 status=status.HTTP_400_BAD_REQUEST,
             )
         user.set_password(new_password)
-        user.save()
+        user.save(update_fields=('password',))
         return Response(
             data='Пароль успешно изменен', status=status.HTTP_204_NO_CONTENT
         )
 
+    def get_recipes_limit(self):
+        """Разбирает параметр recipes_limit, None - без ограничения."""
+        recipes_limit = self.request.query_params.get('recipes_limit')
+        if not recipes_limit:
+            return None
+        try:
+            recipes_limit = int(recipes_limit)
+        except ValueError:
+            recipes_limit = -1
+        if recipes_limit < 0:
+            raise ValidationError(
+                {'recipes_limit': 'Должно быть целым неотрицательным числом'}
+            )
+        return recipes_limit
+
     @action(['GET'], detail=False)
     def subscriptions(self, request):
         """Получение списка подписчиков текущего пользователя."""
         user = request.user
-        subscribers = User.objects.filter(subscribed__user=user)
-        page = self.paginate_queryset(subscribers)
-        serializer = self.get_serializer(
-            instance=page, context={'request': request}, many=True
+        subscribers = User.objects.filter(subscribed__user=user).annotate(
+            is_subscribed=Value(True)
         )
+        recipes_limit = self.get_recipes_limit()
+        if self.is_field_requested('recipes'):
+            subscribers = prefetch_author_recipes(subscribers, recipes_limit)
+        page = self.paginate_queryset(subscribers)
+        serializer = self.get_serializer(instance=page, many=True)
         return self.get_paginated_response(serializer.data)
 
     @action(['POST', 'DELETE'], detail=True)
@@ -118,7 +197,12 @@ class UserViewSet(
         """Подписка на пользователя."""
         if self.request.method == 'POST':
             serializer = self.get_serializer(
-                data=request.data, context={'request': request, 'id': pk}
+                data=request.data,
+                context={
+                    'request': request,
+                    'id': pk,
+                    'recipes_limit': self.get_recipes_limit(),
+                },
             )
             serializer.is_valid(raise_exception=True)
             response_data = serializer.save(id=pk)
@@ -137,16 +221,45 @@ class UserViewSet(
                 status=status.HTTP_404_NOT_FOUND,
             )
 
+    @action(['POST', 'DELETE'], detail=False, url_path='batch/subscribe')
+    def batch_subscribe(self, request):
+        """Подписка на нескольких пользователей или отписка от них."""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        author_ids = serializer.validated_data['ids']
+        if request.method == 'POST':
+            results = subscribe_authors(request.user, author_ids)
+        else:
+            results = unsubscribe_authors(request.user, author_ids)
+        return Response({'results': results})
+
 
-class TagViewSet(viewsets.ModelViewSet):
+class TagViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """Вьюсет для модели тэги."""
 
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     pagination_class = None
 
+    def get_version_names(self):
+        return (TAGS,)
+
+    def list(self, request, *args, **kwargs):
+        """Отдает теги из реестра в памяти."""
+        return Response(tag_registry.all())
 
-class IngredientViewSet(viewsets.ModelViewSet):
+    def retrieve(self, request, *args, **kwargs):
+        """Отдает тег из реестра в памяти."""
+        try:
+            tag = tag_registry.get(int(kwargs.get('pk')))
+        except ValueError:
+            tag = None
+        if tag is None:
+            raise NotFound
+        return Response(tag)
+
+
+class IngredientViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """Вьюсет для модели ингридиенты."""
 
     queryset = Ingredient.objects.all()
@@ -154,9 +267,55 @@ class IngredientViewSet(viewsets.ModelViewSet):
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientFilter
     pagination_class = None
+    conditional_vary = ('Authorization', 'Accept-Encoding')
+
+    def get_version_names(self):
+        return (INGREDIENTS,)
+
+    def is_catalog_request(self, request):
+        return self.action == 'list' and not request.query_params
+
+    def get_catalog_encoding(self, request):
+        return choose_encoding(
+            request.META.get('HTTP_ACCEPT_ENCODING', ''), CATALOG_ENCODINGS
+        )
+
+    def get_etag_suffix(self, request):
+        if not self.is_catalog_request(request):
+            return ''
+        encoding = self.get_catalog_encoding(request)
+        return '' if encoding == 'identity' else f'-{encoding}'
+
+    def list(self, request, *args, **kwargs):
+        """Ищет ингредиенты по названию в индексе в памяти."""
+        if self.is_catalog_request(request):
+            return self.catalog_response(request)
+        name = request.query_params.get('name')
+        if name is None:
+            return super().list(request, *args, **kwargs)
+        limit = settings.INGREDIENT_SEARCH_LIMIT
+        try:
+            limit = min(int(request.query_params.get('limit', limit)), limit)
+        except ValueError:
+            pass
+        return Response(ingredient_index.search(name, max(limit, 1)))
+
+    def catalog_response(self, request):
+        """Отдает заранее сжатый каталог ингредиентов целиком."""
+        catalog = get_catalog()
+        encoding = self.get_catalog_encoding(request)
+        response = HttpResponse(
+            catalog[encoding], content_type='application/json'
+        )
+        if encoding != 'identity':
+            response['Content-Encoding'] = encoding
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
 
 
 class RecipeViewSet(
+    ConditionalGetMixin,
+    SparseFieldsetMixin,
     mixins.CreateModelMixin,
     mixins.ListModelMixin,
     mixins.RetrieveModelMixin,
@@ -169,14 +328,103 @@ class RecipeViewSet(
     queryset = Recipe.objects.all()
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
+    parser_classes = (JSONParser, MultiPartParser, FormParser)
+    sparse_fields = RecipeListSerializer.Meta.fields
+    conditional_actions = ('list', 'retrieve', 'feed')
+
+    @property
+    def paginator(self):
+        """Включает курсорную пагинацию по параметру pagination=cursor."""
+        if not hasattr(self, '_paginator'):
+            query_params = self.request.query_params
+            if (
+                self.action == 'feed'
+                or query_params.get('pagination') == 'cursor'
+                or 'cursor' in query_params
+            ):
+                self._paginator = RecipeCursorPagination()
+            else:
+                self._paginator = super().paginator
+        return self._paginator
+
+    def get_version_names(self):
+        user = self.request.user
+        if user.is_anonymous:
+            return (RECIPES,)
+        return (RECIPES, user_flags_version_name(user.id))
 
     def get_queryset(self):
-        return (
-            Recipe.objects.select_related('author')
-            .prefetch_related('tags', 'ingredients')
-            .all()
+        user = self.request.user
+        return prefetch_recipe_relations(
+            annotate_recipe_flags(Recipe.objects.all(), user), user
         )
 
+    def is_shared_cache_allowed(self):
+        """Проверяет, что ответ не зависит от фильтров пользователя."""
+        query_params = self.request.query_params
+        return not (
+            'is_favorited' in query_params
+            or 'is_in_shopping_cart' in query_params
+        )
+
+    def list(self, request, *args, **kwargs):
+        """Собирает страницу рецептов из готовых представлений."""
+        shared = self.is_shared_cache_allowed()
+        key = make_page_key(request)
+        version = get_version(RECIPES)
+        data = get_recipes_page(key, version) if shared else None
+        requested = self.get_requested_fields()
+        if data is None:
+            fields = with_flag_key(requested)
+            queryset = Recipe.objects.only(*get_recipe_columns(fields))
+            if not shared:
+                queryset = annotate_recipe_flags(queryset, request.user)
+            page = self.paginate_queryset(self.filter_queryset(queryset))
+            data = self.get_paginated_response(
+                get_representations(page, request, fields)
+            ).data
+            if shared:
+                set_recipes_page(key, data, version)
+        apply_user_flags(data['results'], request.user, requested)
+        return Response(data)
+
+    def retrieve(self, request, *args, **kwargs):
+        """Отдает рецепт из готового представления."""
+        key = make_page_key(request)
+        version = get_version(RECIPES)
+        data = get_recipes_page(key, version)
+        requested = self.get_requested_fields()
+        if data is None:
+            fields = with_flag_key(requested)
+            instance = get_object_or_404(
+                Recipe.objects.only(*get_recipe_columns(fields)),
+                pk=kwargs.get('pk'),
+            )
+            data = get_representations([instance], request, fields)[0]
+            set_recipes_page(key, data, version)
+        apply_user_flags([data], request.user, requested)
+        return Response(data)
+
+    @action(['GET'], detail=False)
+    def feed(self, request):
+        """Рецепты авторов, на которых подписан пользователь.
+
+        Страницы отдаются курсорной пагинацией от новых к старым.
+        """
+        requested = self.get_requested_fields()
+        fields = with_flag_key(requested)
+        queryset = Recipe.objects.only(*get_recipe_columns(fields)).filter(
+            author__in=Subscribe.objects.filter(user=request.user).values(
+                'author_id'
+            )
+        )
+        page = self.paginate_queryset(queryset)
+        data = self.get_paginated_response(
+            get_representations(page, request, fields)
+        ).data
+        apply_user_flags(data['results'], request.user, requested)
+        return Response(data)
+
     def get_permissions(self):
         """Возвращает права доступа в зависимости от действия."""
 
@@ -204,6 +452,8 @@ class RecipeViewSet(
             'retrieve': RecipeListSerializer,
             'favorite': FavoriteSerializer,
             'shopping_cart': ShoppingCartSerializer,
+            'batch_favorite': BatchIdsSerializer,
+            'batch_shopping_cart': BatchIdsSerializer,
         }
         return serializer_class_dict.get(self.action, RecipeCreateSerializer)
 
@@ -265,23 +515,118 @@ class RecipeViewSet(
                 status=status.HTTP_404_NOT_FOUND,
             )
 
-    @action(['GET'], detail=False)
+    def get_batch_ids(self):
+        """Проверяет и возвращает список id пакетной операции."""
+        serializer = self.get_serializer(data=self.request.data)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data['ids']
+
+    def batch_recipes(self, model):
+        """Добавляет или убирает рецепты из списка пользователя пачкой."""
+        recipe_ids = self.get_batch_ids()
+        if self.request.method == 'POST':
+            results = add_recipes(model, self.request.user, recipe_ids)
+        else:
+            results = remove_recipes(model, self.request.user, recipe_ids)
+        return Response({'results': results})
+
+    @action(['POST', 'DELETE'], detail=False, url_path='batch/favorite')
+    def batch_favorite(self, request):
+        """Добавляет или удаляет из избранного несколько рецептов."""
+        return self.batch_recipes(Favorite)
+
+    @action(['POST', 'DELETE'], detail=False, url_path='batch/shopping_cart')
+    def batch_shopping_cart(self, request):
+        """Добавляет или удаляет из списка покупок несколько рецептов."""
+        return self.batch_recipes(ShoppingCart)
+
+    def use_json_renderer(self):
+        """Отдает ответ выгрузки в JSON вместо выбранного формата."""
+        self.request.accepted_renderer = JSONRenderer()
+        self.request.accepted_media_type = JSONRenderer.media_type
+
+    def handle_exception(self, exc):
+        if self.action == 'download_shopping_cart':
+            self.use_json_renderer()
+        return super().handle_exception(exc)
+
+    @action(
+        ['GET'],
+        detail=False,
+        renderer_classes=(
+            PDFShoppingListRenderer,
+            PlainTextShoppingListRenderer,
+            CSVShoppingListRenderer,
+            JSONShoppingListRenderer,
+        ),
+    )
     def download_shopping_cart(self, request):
-        """Скачивает список покупок в формате PDF."""
+        """Скачивает список покупок в PDF, TXT, CSV или JSON.
+
+        Формат выбирается параметром format или заголовком Accept,
+        по умолчанию - PDF. С параметром async=1 PDF формируется в пуле
+        процессов, а в ответ возвращается id задачи для
+        download_shopping_cart/<id>/.
+        """
+        renderer = request.accepted_renderer
         shopping_cart = (
-            RecipeIngredient.objects.filter(
-                recipe__shoppingcart__user=request.user
-            )
+            ShoppingListItem.objects.filter(user=request.user)
             .values(
-                'ingredient__name',
-                'ingredient__measurement_unit',
+                'amount',
+                name=F('ingredient__name'),
+                measurement_unit=F('ingredient__measurement_unit'),
             )
             .order_by('ingredient__name')
-            .annotate(ingredient_amount_sum=Sum('amount'))
         )
-        buy_list_pdf = create_shopping_list_pdf(shopping_cart)
-        response = HttpResponse(buy_list_pdf, content_type='application/pdf')
-        response[
-            'Content-Disposition'
-        ] = 'attachment; filename=shopping-list.pdf'
+        if (
+            renderer.format == PDFShoppingListRenderer.format
+            and request.query_params.get('async') == '1'
+        ):
+            job_id, job_status = start_pdf_export(
+                request.user.id, shopping_cart.iterator()
+            )
+            self.use_json_renderer()
+            return Response(
+                {'id': job_id, 'status': job_status},
+                status=status.HTTP_202_ACCEPTED,
+            )
+        response = StreamingHttpResponse(
+            renderer.stream(shopping_cart.iterator()),
+            content_type=renderer.get_content_type(),
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename=shopping-list.{renderer.format}'
+        )
+        return response
+
+    @action(
+        ['GET'],
+        detail=False,
+        url_path=r'download_shopping_cart/(?P<job_id>[0-9a-f]{32})',
+    )
+    def download_shopping_cart_job(self, request, job_id=None):
+        """Отдает PDF, сформированный задачей выгрузки.
+
+        Неудавшаяся задача - обычный результат, а не ошибка сервера,
+        поэтому ее состояние отдается с кодом 200.
+        """
+        job = get_job(job_id)
+        if job is None or job['user_id'] != request.user.id:
+            raise NotFound
+        if job['status'] == FAILED:
+            return Response({'id': job_id, 'status': FAILED})
+        if job['status'] == PENDING:
+            return Response(
+                {'id': job_id, 'status': PENDING},
+                status=status.HTTP_202_ACCEPTED,
+            )
+        pdf = get_shopping_list_pdf(job['digest'])
+        if pdf is None:
+            raise NotFound('Файл больше не доступен, повторите выгрузку')
+        response = StreamingHttpResponse(
+            iter_chunks(pdf), content_type=PDFShoppingListRenderer.media_type
+        )
+        response['Content-Disposition'] = (
+            'attachment; filename=shopping-list.pdf'
+        )
         return response
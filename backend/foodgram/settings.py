@@ -74,6 +74,38 @@ DATABASES = {
     }
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': getenv(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.filebased.FileBasedCache',
+        ),
+        'LOCATION': getenv('CACHE_LOCATION', str(BASE_DIR / 'cache')),
+    },
+    'shopping_lists': {
+        'BACKEND': getenv(
+            'SHOPPING_LISTS_CACHE_BACKEND',
+            'django.core.cache.backends.filebased.FileBasedCache',
+        ),
+        'LOCATION': getenv(
+            'SHOPPING_LISTS_CACHE_LOCATION',
+            str(BASE_DIR / 'cache' / 'shopping-lists'),
+        ),
+        'TIMEOUT': 60 * 60 * 24,
+        'OPTIONS': {
+            'MAX_ENTRIES': int(
+                getenv('SHOPPING_LISTS_CACHE_MAX_ENTRIES', 1000)
+            ),
+        },
+    },
+}
+
+RECIPES_CACHE_TIMEOUT = int(getenv('RECIPES_CACHE_TIMEOUT', 60 * 15))
+
+SHOPPING_LIST_EXPORT_WORKERS = int(getenv('SHOPPING_LIST_EXPORT_WORKERS', 2))
+SHOPPING_LIST_JOB_TIMEOUT = 60 * 60
+SHOPPING_LIST_JOB_DEADLINE = int(getenv('SHOPPING_LIST_JOB_DEADLINE', 60 * 5))
+
 AUTH_USER_MODEL = 'users.User'
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -105,6 +137,19 @@ STATIC_ROOT = BASE_DIR / 'collected_static'
 MEDIA_URL = getenv('MEDIA_URL', default='/media/')
 MEDIA_ROOT = BASE_DIR / 'media'
 
+INGREDIENT_SEARCH_LIMIT = 50
+
+BATCH_MAX_SIZE = 100
+INGREDIENTS_CATALOG_TIMEOUT = None
+
+FILE_UPLOAD_MAX_MEMORY_SIZE = 1024 * 1024
+
+RECIPE_IMAGE_VARIANTS = {
+    'thumbnail': (320, 320),
+    'medium': (960, 960),
+}
+RECIPE_IMAGE_QUALITY = 82
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
@@ -1,3 +1,5 @@
+from contextlib import ExitStack
+
 from django.contrib import admin
 from import_export.admin import ImportExportModelAdmin
 from import_export.resources import ModelResource
@@ -8,8 +10,10 @@ from .models import (
     Recipe,
     RecipeIngredient,
     ShoppingCart,
+    ShoppingListItem,
     Tag,
 )
+from .shopping_list import track_recipe_ingredients
 
 
 class RecipeResource(ModelResource):
@@ -43,6 +47,8 @@ class RecipeAdmin(ImportExportModelAdmin):
         'id',
         'name',
         'author',
+        'favorites_count',
+        'shopping_cart_count',
     )
     list_display_links = ('name',)
     search_fields = ('name', 'author__username')
@@ -56,6 +62,10 @@ class RecipeAdmin(ImportExportModelAdmin):
             .prefetch_related('ingredients', 'tags')
         )
 
+    def save_related(self, request, form, formsets, change):
+        with track_recipe_ingredients(form.instance.pk):
+            super().save_related(request, form, formsets, change)
+
 
 class TagResource(ModelResource):
     """Ресурс модели тегов."""
@@ -139,6 +149,23 @@ class RecipeIngredientAdmin(ImportExportModelAdmin):
     list_display_links = ('recipe',)
     search_fields = ('recipe__author', 'recipe__tags')
 
+    def save_model(self, request, obj, form, change):
+        with track_recipe_ingredients(obj.recipe_id):
+            super().save_model(request, obj, form, change)
+
+    def delete_model(self, request, obj):
+        with track_recipe_ingredients(obj.recipe_id):
+            super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        recipe_ids = queryset.order_by().values_list(
+            'recipe_id', flat=True
+        ).distinct()
+        with ExitStack() as stack:
+            for recipe_id in sorted(recipe_ids):
+                stack.enter_context(track_recipe_ingredients(recipe_id))
+            super().delete_queryset(request, queryset)
+
 
 class FavoriteResource(ModelResource):
     """Ресурс для модели избранных рецептов."""
@@ -198,3 +225,23 @@ class ShoppingCartAdmin(ImportExportModelAdmin):
 
     def get_queryset(self, request):
         return super().get_queryset(request).select_related('user', 'recipe')
+
+
+@admin.register(ShoppingListItem)
+class ShoppingListItemAdmin(admin.ModelAdmin):
+    """Класс для просмотра списков покупок."""
+
+    list_display = (
+        'id',
+        'user',
+        'ingredient',
+        'amount',
+    )
+    list_display_links = ('user',)
+    search_fields = ('user__username', 'ingredient__name')
+    readonly_fields = ('user', 'ingredient', 'amount')
+
+    def get_queryset(self, request):
+        return (
+            super().get_queryset(request).select_related('user', 'ingredient')
+        )
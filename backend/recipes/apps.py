@@ -5,3 +5,6 @@ class RecipesConfig(AppConfig):
     name = 'recipes'
     verbose_name = 'Рецепты'
     verbose_name_plural = 'Рецепты'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,35 @@
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_related(model, field):
+    """Подзапрос количества связанных записей модели."""
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('pk'))
+            .values('total')
+        ),
+        0,
+    )
+
+
+def rebuild_counters(apps):
+    """Пересчитывает счетчики рецептов и пользователей."""
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Favorite = apps.get_model('recipes', 'Favorite')
+    ShoppingCart = apps.get_model('recipes', 'ShoppingCart')
+    User = apps.get_model('users', 'User')
+    Subscribe = apps.get_model('users', 'Subscribe')
+
+    recipes = Recipe.objects.update(
+        favorites_count=count_related(Favorite, 'recipe'),
+        shopping_cart_count=count_related(ShoppingCart, 'recipe'),
+    )
+    users = User.objects.update(
+        recipes_count=count_related(Recipe, 'author'),
+        subscribers_count=count_related(Subscribe, 'author'),
+    )
+    return recipes, users
@@ -0,0 +1,81 @@
+from io import BytesIO
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+VARIANTS_DIR = 'recipes/variants'
+VARIANT_FORMATS = (('jpg', 'JPEG'), ('webp', 'WEBP'))
+
+
+def get_variant_name(image_name, variant, extension):
+    """Имя файла уменьшенной копии изображения."""
+    stem = PurePosixPath(image_name).stem
+    return f'{VARIANTS_DIR}/{stem}_{variant}.{extension}'
+
+
+def get_variant_urls(image):
+    """Адреса всех уменьшенных копий изображения."""
+    if not image:
+        return {}
+    urls = {}
+    for variant in settings.RECIPE_IMAGE_VARIANTS:
+        for extension, _ in VARIANT_FORMATS:
+            key = variant if extension == 'jpg' else f'{variant}_{extension}'
+            urls[key] = image.storage.url(
+                get_variant_name(image.name, variant, extension)
+            )
+    return urls
+
+
+def open_rgb(image):
+    """Открывает изображение и приводит его к RGB на белом фоне."""
+    image.open('rb')
+    try:
+        picture = ImageOps.exif_transpose(Image.open(image))
+        picture.load()
+    finally:
+        image.close()
+    if picture.mode in ('RGBA', 'LA', 'P'):
+        picture = picture.convert('RGBA')
+        background = Image.new('RGB', picture.size, 'white')
+        background.paste(picture, mask=picture.getchannel('A'))
+        return background
+    return picture.convert('RGB')
+
+
+def generate_variants(image, force=False):
+    """Создает уменьшенные копии изображения в JPEG и WebP.
+
+    Уже существующие файлы пропускаются, если не передан force.
+    Возвращает количество созданных файлов.
+    """
+    if not image:
+        return 0
+    storage = image.storage
+    pending = [
+        (variant, size, extension, image_format)
+        for variant, size in settings.RECIPE_IMAGE_VARIANTS.items()
+        for extension, image_format in VARIANT_FORMATS
+        if force
+        or not storage.exists(get_variant_name(image.name, variant, extension))
+    ]
+    if not pending:
+        return 0
+    picture = open_rgb(image)
+    for variant, size, extension, image_format in pending:
+        resized = picture.copy()
+        resized.thumbnail(size, Image.LANCZOS)
+        buffer = BytesIO()
+        resized.save(
+            buffer,
+            format=image_format,
+            quality=settings.RECIPE_IMAGE_QUALITY,
+            optimize=True,
+        )
+        name = get_variant_name(image.name, variant, extension)
+        if storage.exists(name):
+            storage.delete(name)
+        storage.save(name, ContentFile(buffer.getvalue()))
+    return len(pending)
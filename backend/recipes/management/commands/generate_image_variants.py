@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from recipes.images import generate_variants
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    """Создает уменьшенные копии изображений существующих рецептов."""
+
+    help = 'Создает миниатюры и WebP-копии изображений рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Пересоздать уже существующие копии',
+        )
+
+    def handle(self, *args, **options):
+        created = failed = 0
+        recipes = Recipe.objects.only('id', 'image').iterator()
+        for recipe in recipes:
+            try:
+                created += generate_variants(
+                    recipe.image, force=options['force']
+                )
+            except (OSError, ValueError) as error:
+                failed += 1
+                self.stderr.write(f'Рецепт {recipe.pk}: {error}')
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Создано копий: {created}, ошибок: {failed}'
+            )
+        )
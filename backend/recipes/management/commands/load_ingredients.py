@@ -0,0 +1,93 @@
+import json
+from time import perf_counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.cache import INGREDIENTS, bump_version
+from recipes.models import Ingredient
+
+CHUNK_SIZE = 64 * 1024
+SEPARATORS = ' \t\r\n,'
+
+
+def iter_json_array(file):
+    """Построчно разбирает JSON-массив объектов, читая файл частями."""
+    decoder = json.JSONDecoder()
+    buffer = file.read(CHUNK_SIZE).lstrip()
+    if not buffer.startswith('['):
+        raise CommandError('Файл должен содержать JSON-массив')
+    buffer = buffer[1:]
+    while True:
+        buffer = buffer.lstrip(SEPARATORS)
+        if buffer.startswith(']'):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            chunk = file.read(CHUNK_SIZE)
+            if not chunk:
+                raise CommandError('Файл содержит некорректный JSON')
+            buffer += chunk
+            continue
+        yield item
+        buffer = buffer[end:]
+
+
+class Command(BaseCommand):
+    """Загружает каталог ингредиентов из JSON-файла."""
+
+    help = 'Загружает ингредиенты из data/ingredients.json'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            default=settings.BASE_DIR / 'data' / 'ingredients.json',
+            help='Путь к JSON-файлу с ингредиентами',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Количество ингредиентов в одном запросе',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        started = perf_counter()
+        seen = set()
+        batch = []
+        read = skipped = 0
+        with transaction.atomic():
+            count_before = Ingredient.objects.count()
+            with open(options['path'], encoding='utf-8') as file:
+                for item in iter_json_array(file):
+                    read += 1
+                    name = str(item.get('name', '')).strip()
+                    unit = str(item.get('measurement_unit', '')).strip()
+                    if not name or not unit or (name, unit) in seen:
+                        skipped += 1
+                        continue
+                    seen.add((name, unit))
+                    batch.append(
+                        Ingredient(name=name, measurement_unit=unit)
+                    )
+                    if len(batch) >= batch_size:
+                        Ingredient.objects.bulk_create(
+                            batch, ignore_conflicts=True
+                        )
+                        batch = []
+            Ingredient.objects.bulk_create(batch, ignore_conflicts=True)
+            created = Ingredient.objects.count() - count_before
+            transaction.on_commit(lambda: bump_version(INGREDIENTS))
+        elapsed = perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Прочитано: {read}, добавлено: {created}, '
+                f'пропущено: {skipped}, уже были: '
+                f'{read - skipped - created}. '
+                f'Время: {elapsed:.2f} с '
+                f'({read / max(elapsed, 1e-6):.0f} записей/с)'
+            )
+        )
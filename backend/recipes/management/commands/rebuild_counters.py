@@ -0,0 +1,21 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.counters import rebuild_counters
+
+
+class Command(BaseCommand):
+    """Пересчитывает счетчики рецептов, избранного, корзин и подписок."""
+
+    help = 'Пересчитывает денормализованные счетчики'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            recipes, users = rebuild_counters(apps)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Пересчитаны счетчики: рецептов - {recipes}, '
+                f'пользователей - {users}'
+            )
+        )
@@ -0,0 +1,62 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.models import ShoppingListItem
+from recipes.shopping_list import (
+    collect_shopping_lists,
+    rebuild_shopping_lists,
+)
+
+
+class Command(BaseCommand):
+    """Сверяет и пересобирает списки покупок пользователей."""
+
+    help = 'Проверяет списки покупок и пересобирает расходящиеся'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только сообщить о расхождениях, ничего не изменяя',
+        )
+
+    def handle(self, *args, **options):
+        expected = collect_shopping_lists(apps)
+        stored = {
+            (user_id, ingredient_id): amount
+            for user_id, ingredient_id, amount in (
+                ShoppingListItem.objects.values_list(
+                    'user_id', 'ingredient_id', 'amount'
+                )
+            )
+        }
+        user_ids = sorted(
+            {
+                user_id
+                for user_id, ingredient_id in expected.keys() | stored.keys()
+                if expected.get((user_id, ingredient_id))
+                != stored.get((user_id, ingredient_id))
+            }
+        )
+        if not user_ids:
+            self.stdout.write(
+                self.style.SUCCESS('Списки покупок совпадают с корзинами')
+            )
+            return
+        if options['check']:
+            self.stdout.write(
+                self.style.WARNING(
+                    f'Расходятся списки покупок пользователей: '
+                    f'{", ".join(map(str, user_ids))}'
+                )
+            )
+            return
+        with transaction.atomic():
+            items = rebuild_shopping_lists(apps, user_ids)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Пересобраны списки покупок пользователей - {len(user_ids)}, '
+                f'позиций - {items}'
+            )
+        )
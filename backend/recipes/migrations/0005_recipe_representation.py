@@ -0,0 +1,18 @@
+# Generated by Django 4.2.5 on 2026-10-17 06:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='representation',
+            field=models.JSONField(default=dict, editable=False, verbose_name='Готовое представление'),
+        ),
+    ]
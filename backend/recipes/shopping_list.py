@@ -0,0 +1,146 @@
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import Sum
+
+from .models import RecipeIngredient, ShoppingCart, ShoppingListItem
+from users.models import User
+
+
+def get_recipe_amounts(*recipe_ids):
+    """Суммарное количество каждого ингредиента рецептов."""
+    return dict(
+        RecipeIngredient.objects.filter(recipe_id__in=recipe_ids)
+        .order_by()
+        .values('ingredient_id')
+        .annotate(total=Sum('amount'))
+        .values_list('ingredient_id', 'total')
+    )
+
+
+def change_shopping_lists(user_ids, changes):
+    """Прибавляет к спискам покупок пользователей изменения количества.
+
+    changes - словарь {id ингредиента: изменение}. Строки пользователей
+    блокируются на время транзакции, чтобы параллельные изменения одного
+    списка выполнялись по очереди.
+    """
+    changes = {key: delta for key, delta in changes.items() if delta}
+    user_ids = list(user_ids)
+    if not changes or not user_ids:
+        return
+    with transaction.atomic():
+        list(
+            User.objects.select_for_update()
+            .filter(pk__in=user_ids)
+            .order_by('pk')
+            .values_list('pk', flat=True)
+        )
+        items = {
+            (item.user_id, item.ingredient_id): item
+            for item in ShoppingListItem.objects.filter(
+                user_id__in=user_ids, ingredient_id__in=changes
+            )
+        }
+        created, updated, deleted = [], [], []
+        for user_id in user_ids:
+            for ingredient_id, delta in changes.items():
+                item = items.get((user_id, ingredient_id))
+                if item is None:
+                    if delta > 0:
+                        created.append(
+                            ShoppingListItem(
+                                user_id=user_id,
+                                ingredient_id=ingredient_id,
+                                amount=delta,
+                            )
+                        )
+                    continue
+                item.amount += delta
+                if item.amount > 0:
+                    updated.append(item)
+                else:
+                    deleted.append(item.pk)
+        ShoppingListItem.objects.bulk_create(created)
+        ShoppingListItem.objects.bulk_update(updated, ('amount',))
+        ShoppingListItem.objects.filter(pk__in=deleted).delete()
+
+
+def add_recipe(user_id, *recipe_ids):
+    """Добавляет ингредиенты рецептов в список покупок пользователя."""
+    change_shopping_lists((user_id,), get_recipe_amounts(*recipe_ids))
+
+
+def remove_recipe(user_id, recipe_id):
+    """Убирает ингредиенты рецепта из списка покупок пользователя."""
+    change_shopping_lists(
+        (user_id,),
+        {
+            ingredient_id: -amount
+            for ingredient_id, amount in get_recipe_amounts(recipe_id).items()
+        },
+    )
+
+
+@contextmanager
+def track_recipe_ingredients(recipe_id):
+    """Переносит изменения ингредиентов рецепта в списки покупок.
+
+    Запоминает количество ингредиентов до выполнения блока и после него
+    и применяет разницу к спискам всех, у кого рецепт в корзине.
+    """
+    with transaction.atomic():
+        before = get_recipe_amounts(recipe_id)
+        yield
+        after = get_recipe_amounts(recipe_id)
+        changes = {
+            ingredient_id: after.get(ingredient_id, 0)
+            - before.get(ingredient_id, 0)
+            for ingredient_id in before.keys() | after.keys()
+        }
+        if any(changes.values()):
+            change_shopping_lists(
+                ShoppingCart.objects.filter(recipe_id=recipe_id).values_list(
+                    'user_id', flat=True
+                ),
+                changes,
+            )
+
+
+def collect_shopping_lists(apps, user_ids=None):
+    """Заново суммирует ингредиенты рецептов в корзинах пользователей.
+
+    Возвращает словарь {(id пользователя, id ингредиента): количество}.
+    """
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    if user_ids is None:
+        lookup = {'recipe__shoppingcart__isnull': False}
+    else:
+        lookup = {'recipe__shoppingcart__user__in': user_ids}
+    rows = (
+        RecipeIngredient.objects.filter(**lookup)
+        .order_by()
+        .values_list('recipe__shoppingcart__user', 'ingredient')
+        .annotate(total=Sum('amount'))
+    )
+    return {
+        (user_id, ingredient_id): total
+        for user_id, ingredient_id, total in rows
+    }
+
+
+def rebuild_shopping_lists(apps, user_ids=None):
+    """Пересобирает списки покупок из корзин пользователей."""
+    ShoppingListItem = apps.get_model('recipes', 'ShoppingListItem')
+    totals = collect_shopping_lists(apps, user_ids)
+    items = ShoppingListItem.objects.all()
+    if user_ids is not None:
+        items = items.filter(user__in=user_ids)
+    items.delete()
+    ShoppingListItem.objects.bulk_create(
+        ShoppingListItem(
+            user_id=user_id, ingredient_id=ingredient_id, amount=amount
+        )
+        for (user_id, ingredient_id), amount in totals.items()
+    )
+    return len(totals)
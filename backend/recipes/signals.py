@@ -0,0 +1,120 @@
+from django.apps import apps
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import (
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+from import_export.signals import post_import
+
+from .images import generate_variants
+from .models import Favorite, Recipe, RecipeIngredient, ShoppingCart
+from .shopping_list import add_recipe, rebuild_shopping_lists, remove_recipe
+from users.models import User
+
+
+def change_counter(model, pk, field, delta):
+    """Атомарно изменяет счетчик записи на delta."""
+    model.objects.filter(pk=pk).update(
+        **{field: Greatest(F(field) + delta, 0)}
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def increase_recipes_count(sender, instance, created, **kwargs):
+    if created:
+        change_counter(User, instance.author_id, 'recipes_count', 1)
+
+
+@receiver(post_save, sender=Recipe)
+def create_image_variants(sender, instance, **kwargs):
+    update_fields = kwargs.get('update_fields')
+    if update_fields is None or 'image' in update_fields:
+        generate_variants(instance.image)
+
+
+@receiver(post_delete, sender=Recipe)
+def decrease_recipes_count(sender, instance, **kwargs):
+    change_counter(User, instance.author_id, 'recipes_count', -1)
+
+
+@receiver(post_save, sender=Favorite)
+def increase_favorites_count(sender, instance, created, **kwargs):
+    if created:
+        change_counter(Recipe, instance.recipe_id, 'favorites_count', 1)
+
+
+@receiver(post_delete, sender=Favorite)
+def decrease_favorites_count(sender, instance, **kwargs):
+    change_counter(Recipe, instance.recipe_id, 'favorites_count', -1)
+
+
+@receiver(post_save, sender=ShoppingCart)
+def increase_shopping_cart_count(sender, instance, created, **kwargs):
+    if created:
+        change_counter(Recipe, instance.recipe_id, 'shopping_cart_count', 1)
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def decrease_shopping_cart_count(sender, instance, **kwargs):
+    change_counter(Recipe, instance.recipe_id, 'shopping_cart_count', -1)
+
+
+@receiver(pre_save, sender=Favorite)
+@receiver(pre_save, sender=ShoppingCart)
+def remember_previous_row(sender, instance, **kwargs):
+    """Запоминает пользователя и рецепт изменяемой строки до сохранения."""
+    instance.previous_row = None
+    if instance.pk is not None:
+        instance.previous_row = (
+            sender.objects.filter(pk=instance.pk)
+            .values_list('user_id', 'recipe_id')
+            .first()
+        )
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+def move_user_recipe(sender, instance, created, **kwargs):
+    """Переносит счетчики и список покупок при смене рецепта в строке."""
+    previous = getattr(instance, 'previous_row', None)
+    if created or previous is None:
+        return
+    user_id, recipe_id = previous
+    if (user_id, recipe_id) == (instance.user_id, instance.recipe_id):
+        return
+    field = (
+        'favorites_count' if sender is Favorite else 'shopping_cart_count'
+    )
+    change_counter(Recipe, recipe_id, field, -1)
+    change_counter(Recipe, instance.recipe_id, field, 1)
+    if sender is ShoppingCart:
+        remove_recipe(user_id, recipe_id)
+        add_recipe(instance.user_id, instance.recipe_id)
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_to_shopping_list(sender, instance, created, **kwargs):
+    if created:
+        add_recipe(instance.user_id, instance.recipe_id)
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def remove_from_shopping_list(sender, instance, **kwargs):
+    remove_recipe(instance.user_id, instance.recipe_id)
+
+
+@receiver(post_import)
+def rebuild_shopping_lists_on_import(sender, model, **kwargs):
+    """Пересобирает списки покупок после импорта ингредиентов рецептов.
+
+    Импорт сохраняет строки в обход админки, поэтому изменения
+    количества неизвестны, и списки собираются заново.
+    """
+    if model is RecipeIngredient:
+        with transaction.atomic():
+            rebuild_shopping_lists(apps)
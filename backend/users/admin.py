@@ -18,6 +18,8 @@ class UserAdmin(BaseUserAdmin):
         'last_name',
         'is_staff',
         'date_joined',
+        'recipes_count',
+        'subscribers_count',
     )
     list_display_links = ('username',)
     search_fields = ('username', 'email', 'first_name', 'last_name')
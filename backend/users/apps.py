@@ -5,3 +5,6 @@ class UsersConfig(AppConfig):
     name = 'users'
     verbose_name = 'Пользователи'
     verbose_name_plural = 'Пользователи'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -1,6 +1,8 @@
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.core.validators import EmailValidator
 from django.db import models
+from django.db.models.functions import Upper
 
 from api.validators import validate_username
 
@@ -30,6 +32,16 @@ class User(AbstractUser):
         blank=False,
         max_length=150,
     )
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='Рецептов',
+        default=0,
+        editable=False,
+    )
+    subscribers_count = models.PositiveIntegerField(
+        verbose_name='Подписчиков',
+        default=0,
+        editable=False,
+    )
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = (
@@ -52,6 +64,16 @@ class User(AbstractUser):
                 name='unique_username',
             ),
         )
+        indexes = (
+            GinIndex(
+                OpClass(Upper('email'), name='gin_trgm_ops'),
+                name='user_email_trgm_idx',
+            ),
+            GinIndex(
+                OpClass(Upper('username'), name='gin_trgm_ops'),
+                name='user_username_trgm_idx',
+            ),
+        )
 
     def __str__(self):
         return f'{self.username} ({self.email})'